@@ -1,15 +1,26 @@
-from typing import Any, Dict, List
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
 
 from backend.services.engine import (
+    TruncatedResponseError,
     build_graph_image_url,
+    client,
+    normalize_analysis,
+    render_mermaid_skeleton,
     stage1_nlp_to_graph,
     stage2_inject_law_context,
     stage3_expert_analysis,
 )
+from common.config import BATCH_CONCURRENCY, BATCH_MAX_SCENARIOS
+
+logger = logging.getLogger(__name__)
 
 
 class AnalyzeRequest(BaseModel):
@@ -18,6 +29,12 @@ class AnalyzeRequest(BaseModel):
     scenario: str
 
 
+class BatchRequest(BaseModel):
+    """다건 분석 API 입력 스키마."""
+
+    scenarios: List[str] = Field(..., max_length=BATCH_MAX_SCENARIOS)
+
+
 class AnalyzeResponse(BaseModel):
     """분석 API 출력 스키마."""
 
@@ -32,10 +49,26 @@ class AnalyzeResponse(BaseModel):
     graph_image_url: str
 
 
+class BatchItemResponse(BaseModel):
+    """다건 분석 API 항목별 결과 (성공 시 result, 실패 시 error)."""
+
+    scenario: str
+    result: Optional[AnalyzeResponse] = None
+    error: Optional[str] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    yield
+    # 종료 시 OpenAI 클라이언트의 HTTP 커넥션 풀 정리
+    await client.close()
+
+
 app = FastAPI(
     title="Audit Independence Scanner API",
     description="회계법인 감사 독립성 리스크 자동 분석 API",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -47,36 +80,38 @@ app.add_middleware(
 )
 
 
-@app.post("/analyze", response_model=AnalyzeResponse)
-async def analyze(req: AnalyzeRequest) -> AnalyzeResponse:
-    scenario = req.scenario
+@app.exception_handler(TruncatedResponseError)
+async def truncated_response_handler(
+    request: Request, exc: TruncatedResponseError
+) -> JSONResponse:
+    # 잘린 응답을 "검토 중" 판정으로 내보내지 않고, 원인을 그대로 알립니다.
+    return JSONResponse(status_code=502, content={"detail": str(exc)})
+
 
+async def _analyze_impl(scenario: str) -> AnalyzeResponse:
+    """시나리오 하나에 대해 전체 파이프라인(단계 1~4)을 실행합니다."""
     # 1. 구조화
-    graph_data = stage1_nlp_to_graph(scenario)
+    graph_data = await stage1_nlp_to_graph(scenario)
 
     # 2. 법령 주입
     law_context = stage2_inject_law_context(graph_data)
 
     # 3. 전문가 분석
-    raw_analysis = stage3_expert_analysis(scenario, graph_data, law_context)
-
-    # status 값이 프롬프트 설명 문구 등으로 잘못 나오는 경우를 방지하기 위한 후처리
-    valid_statuses = ["수임 불가", "안전장치 적용 시 수임 가능", "수임 가능"]
-    status = str(raw_analysis.get("status", "")).strip()
-    if status not in valid_statuses:
-        if "수임 불가" in status:
-            status = "수임 불가"
-        elif "안전장치" in status:
-            status = "안전장치 적용 시 수임 가능"
-        elif "수임 가능" in status:
-            status = "수임 가능"
-        else:
-            status = "검토 중"
+    # 리스크 맵 골격(노드/관계 라벨)은 단계 3 결과와 무관하므로 별도 스레드에서 동시에 계산
+    raw_analysis, skeleton = await asyncio.gather(
+        stage3_expert_analysis(scenario, graph_data, law_context),
+        asyncio.to_thread(render_mermaid_skeleton, graph_data),
+    )
 
-    analysis_result: Dict[str, Any] = {**raw_analysis, "status": status}
+    # status·위험 노드/엣지 값이 설명 문구나 잘못된 형태로 나오는 경우를 위한 후처리
+    analysis_result = normalize_analysis(raw_analysis)
+    status = analysis_result["status"]
 
     # 4. 그래프 이미지 URL 생성
-    graph_url = build_graph_image_url(graph_data, analysis_result)
+    # Mermaid 문자열 조립 + base64 인코딩은 CPU 작업이므로 이벤트 루프 밖에서 실행
+    graph_url = await asyncio.to_thread(
+        build_graph_image_url, graph_data, analysis_result, skeleton
+    )
 
     return AnalyzeResponse(
         status=status,
@@ -85,12 +120,50 @@ async def analyze(req: AnalyzeRequest) -> AnalyzeResponse:
         relevant_laws=analysis_result.get("relevant_laws", []),
         graph=graph_data,
         law_context=law_context,
-        risky_node_ids=analysis_result.get("risky_node_ids", []),
-        risky_edge_indices=analysis_result.get("risky_edge_indices", []),
+        risky_node_ids=analysis_result["risky_node_ids"],
+        risky_edge_indices=analysis_result["risky_edge_indices"],
         graph_image_url=graph_url,
     )
 
 
+@app.post("/analyze", response_model=AnalyzeResponse)
+async def analyze(req: AnalyzeRequest) -> AnalyzeResponse:
+    return await _analyze_impl(req.scenario)
+
+
+# 모든 /batch 요청이 공유하는 동시 실행 한도 (요청마다 만들면 한도가 요청 수만큼 늘어남)
+_batch_semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+
+@app.post("/batch", response_model=List[BatchItemResponse])
+async def batch(req: BatchRequest) -> List[BatchItemResponse]:
+    """
+    여러 시나리오를 동시에 분석합니다. (동시 실행 수는 BATCH_CONCURRENCY 로 제한)
+    - 일부 시나리오가 실패해도 나머지 결과는 그대로 돌려주고, 실패 항목에는 error 를 채웁니다.
+    """
+
+    async def one(scenario: str) -> AnalyzeResponse:
+        async with _batch_semaphore:
+            return await _analyze_impl(scenario)
+
+    outcomes = await asyncio.gather(
+        *(one(s) for s in req.scenarios), return_exceptions=True
+    )
+    items: List[BatchItemResponse] = []
+    for scenario, outcome in zip(req.scenarios, outcomes):
+        if isinstance(outcome, TruncatedResponseError):
+            # 사용자가 조치할 수 있는 도메인 오류는 메시지를 그대로 전달
+            items.append(BatchItemResponse(scenario=scenario, error=str(outcome)))
+        elif isinstance(outcome, BaseException):
+            # 그 밖의 예외는 내부 정보(URL, 키 일부 등)가 섞일 수 있으므로 로그에만 남김
+            logger.error("batch item failed", exc_info=outcome)
+            error = "분석 중 내부 오류가 발생했습니다."
+            items.append(BatchItemResponse(scenario=scenario, error=error))
+        else:
+            items.append(BatchItemResponse(scenario=scenario, result=outcome))
+    return items
+
+
 @app.get("/health")
 async def health() -> Dict[str, str]:
     return {"status": "ok"}
@@ -0,0 +1,156 @@
+"""LLM 응답 캐시.
+
+- 정확 일치 캐시: 요청(모델, temperature, 프롬프트 등)의 SHA-256 → 응답 문자열 (LRU)
+- 의미 유사 캐시(선택): 시나리오 임베딩의 코사인 유사도가 임계값 이상이면 이전 응답 재사용
+
+캐시는 프로세스 메모리에만 존재하며, 응답은 파싱 전 문자열로 보관해
+호출자끼리 같은 dict 객체를 공유하지 않도록 합니다.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import threading
+from collections import OrderedDict
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """
+    최대 개수를 넘으면 가장 오래 사용하지 않은 항목부터 버리는 단순 LRU 캐시.
+    - asyncio.to_thread 등 여러 스레드에서 호출될 수 있으므로 내부 잠금으로 보호합니다.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._data: "OrderedDict[K, V]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: K) -> Optional[V]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key: K, value: V) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class ResponseCache:
+    """
+    정확 일치 응답 캐시.
+    - 같은 키에 대한 동시 요청은 asyncio.Lock 으로 묶어 API 를 한 번만 호출합니다 (stampede 방지).
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self._store: LRUCache[str, str] = LRUCache(maxsize)
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # 키별 잠금을 기다리거나 보유 중인 요청 수 (0 이 되면 잠금을 정리)
+        self._waiters: Dict[str, int] = {}
+
+    @staticmethod
+    def make_key(request: Dict[str, Any]) -> str:
+        """요청 파라미터 전체(모델, temperature, messages 등)로 캐시 키를 만듭니다."""
+        payload = json.dumps(request, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """API 호출 없이 캐시된 응답만 조회합니다."""
+        return self._store.get(key)
+
+    async def get_or_create(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[str]],
+        is_valid: Callable[[str], bool] = bool,
+    ) -> str:
+        """
+        캐시된 응답을 돌려주거나, 없으면 factory() 로 만들어 저장합니다.
+        - is_valid(응답) 이 참인 응답만 저장합니다 (기본: 빈 문자열 제외).
+        """
+        cached = self._store.get(key)
+        if cached is not None:
+            return cached
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            async with lock:
+                # 대기하는 동안 다른 요청이 채워 넣었을 수 있으므로 한 번 더 확인
+                cached = self._store.get(key)
+                if cached is None:
+                    cached = await factory()
+                    # 잘못된 응답은 캐시하지 않음 (다음 요청에서 재시도)
+                    if is_valid(cached):
+                        self._store.set(key, cached)
+            return cached
+        finally:
+            # 아직 같은 잠금을 기다리는 요청이 있으면 유지해야 새 요청이 별도 잠금으로
+            # 동시에 factory() 를 호출하지 않습니다.
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+                del self._locks[key]
+
+
+class SemanticCache:
+    """
+    임베딩 코사인 유사도 기반 캐시.
+    - 항목 수가 작다는 전제(데모/사내 사용)에서 선형 탐색으로 가장 가까운 응답을 찾습니다.
+    - tag 가 같은 항목끼리만 비교합니다 (예: 같은 그래프 구조일 때만 재사용).
+    - 탐색은 CPU 작업이므로 asyncio.to_thread 로 호출할 수 있도록 내부 잠금으로 보호합니다.
+    """
+
+    def __init__(self, threshold: float, maxsize: int) -> None:
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self._entries: List[Tuple[List[float], float, Hashable, str]] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _norm(vec: Sequence[float]) -> float:
+        return math.sqrt(sum(x * x for x in vec))
+
+    def lookup(self, vec: Sequence[float], tag: Hashable = None) -> Optional[str]:
+        norm = self._norm(vec)
+        if not norm:
+            return None
+        with self._lock:
+            entries = [e for e in self._entries if e[2] == tag]
+        best_score, best_value = 0.0, None
+        for entry_vec, entry_norm, _, value in entries:
+            score = sum(a * b for a, b in zip(vec, entry_vec)) / (norm * entry_norm)
+            if score > best_score:
+                best_score, best_value = score, value
+        return best_value if best_score >= self.threshold else None
+
+    def add(self, vec: Sequence[float], value: str, tag: Hashable = None) -> None:
+        norm = self._norm(vec)
+        if not norm or not value:
+            return
+        with self._lock:
+            self._entries.append((list(vec), norm, tag, value))
+            if len(self._entries) > self.maxsize:
+                del self._entries[0]
@@ -6,30 +6,93 @@
 - 단계 4: 그래프/분석 → Mermaid 기반 리스크 맵 이미지 URL
 """
 
+import asyncio
 import base64
-import json
+import functools
+import hashlib
+import logging
 import re
 import urllib.parse
-from typing import Any, Dict, List
-
-from openai import OpenAI
-
-from common.config import OPENAI_MODEL_ANALYSIS, OPENAI_MODEL_GRAPH
-
-
-# OpenAI 클라이언트 (환경변수 OPENAI_API_KEY 사용)
-client = OpenAI()
+from types import MappingProxyType
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+import ahocorasick
+import httpx
+import orjson
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, Timeout
+
+from backend.services.cache import LRUCache, ResponseCache, SemanticCache
+from common.config import (
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    OPENAI_MODEL_ANALYSIS,
+    OPENAI_MODEL_EMBEDDING,
+    OPENAI_MODEL_GRAPH,
+    RESPONSE_CACHE_SIZE,
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_THRESHOLD,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+# OpenAI 비동기 클라이언트 (환경변수 OPENAI_API_KEY 사용)
+# - FastAPI 이벤트 루프를 막지 않도록 모든 호출은 await 로 처리합니다.
+# - SDK 기본 http 클라이언트 설정(리다이렉트 등)을 유지한 채 HTTP/2 를 켜고,
+#   풀 크기는 common/config.py 에서 조정합니다 (기본값은 SDK 기본값과 동일).
+# - 앱 종료 시 client.close() 로 연결을 정리합니다. (backend/app.py 참고)
+client = AsyncOpenAI(
+    http_client=DefaultAsyncHttpxClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        ),
+        timeout=Timeout(60.0, connect=5.0),
+    ),
+    max_retries=2,
+)
+
+# 동일 요청(모델/temperature/프롬프트)은 API 를 다시 호출하지 않고 캐시에서 반환
+response_cache = ResponseCache(maxsize=RESPONSE_CACHE_SIZE)
+
+# (선택) 유사한 시나리오는 단계 3 전문가 의견을 재사용
+semantic_cache = (
+    SemanticCache(threshold=SEMANTIC_CACHE_THRESHOLD, maxsize=RESPONSE_CACHE_SIZE)
+    if SEMANTIC_CACHE_ENABLED
+    else None
+)
 
 
 # ---------------------------------------------------------------------------
 # 공통 유틸리티
 # ---------------------------------------------------------------------------
+# 법령명 + (선택) 조항, 예: '공인회계사법 제21조'
+_LAW_RE = re.compile(r"([가-힣]+법)\s*(제?\d+조)?")
+
+# 모델 응답의 ```json ... ``` 코드 펜스
+_JSON_FENCE_OPEN = "```json"
+_JSON_FENCE_CLOSE = "```"
+
+
+@functools.lru_cache(maxsize=1024)
 def get_dynamic_law_url(law_text: str) -> str:
     """
     법령 이름(예: '공인회계사법 제21조')으로 law.go.kr 링크를 동적으로 생성합니다.
     """
     base_url = "https://www.law.go.kr/법령/"
-    match = re.search(r"([가-힣]+법)\s*(제?\d+조)?", law_text)
+    match = _LAW_RE.search(law_text)
     if match:
         law_name = match.group(1)
         article = match.group(2) if match.group(2) else ""
@@ -45,82 +108,251 @@ def safe_json_parse(content: str) -> Dict[str, Any]:
     모델이 반환한 문자열에서 JSON 부분만 안전하게 추출/파싱합니다.
     - ```json ... ``` 형태로 감싸져 있어도 동작합니다.
     """
+    start = content.find(_JSON_FENCE_OPEN)
+    if start != -1:
+        start += len(_JSON_FENCE_OPEN)
+        end = content.rfind(_JSON_FENCE_CLOSE, start)
+        json_str = content[start:end] if end != -1 else content[start:]
+    else:
+        json_str = content
     try:
-        pattern = r"```json\s*(.*?)\s*```"
-        match = re.search(pattern, content, re.DOTALL)
-        json_str = match.group(1) if match else content
-        return json.loads(json_str)
-    except Exception as e:
+        return orjson.loads(json_str)
+    except orjson.JSONDecodeError as e:
         return {"error": "JSON_PARSE_ERROR", "details": str(e)}
 
 
+class TruncatedResponseError(RuntimeError):
+    """모델 응답이 max_tokens 한도에서 잘려 JSON 이 완성되지 않은 경우."""
+
+
+def is_valid_json_reply(content: str) -> bool:
+    """JSON 객체로 파싱되는 응답인지 확인합니다. (캐시 저장 여부 판단용)"""
+    parsed = safe_json_parse(content)
+    return isinstance(parsed, dict) and "error" not in parsed
+
+
+async def cached_chat_completion(**request: Any) -> str:
+    """
+    Chat Completions 를 호출하고 응답 본문(문자열)을 반환합니다.
+    - 요청 파라미터가 완전히 같으면 캐시된 응답을 즉시 돌려줍니다.
+    - JSON 으로 파싱되지 않는 응답은 캐시하지 않아 다음 요청에서 다시 호출합니다.
+    - max_tokens 에 걸려 잘린 응답은 캐시하지 않고 TruncatedResponseError 를 발생시킵니다.
+    """
+
+    async def _call() -> str:
+        response = await client.chat.completions.create(**request)
+        choice = response.choices[0]
+        if choice.finish_reason == "length":
+            raise TruncatedResponseError(
+                f"모델({request.get('model')}) 응답이 max_tokens={request.get('max_tokens')} "
+                "한도에서 잘렸습니다. 시나리오를 줄이거나 한도를 늘려 다시 시도하세요."
+            )
+        return choice.message.content or ""
+
+    return await response_cache.get_or_create(
+        ResponseCache.make_key(request), _call, is_valid=is_valid_json_reply
+    )
+
+
+async def embed_text(text: str) -> List[float]:
+    """의미 유사 캐시 조회용 임베딩 벡터를 만듭니다."""
+    response = await client.embeddings.create(model=OPENAI_MODEL_EMBEDDING, input=text)
+    return response.data[0].embedding
+
+
 # ---------------------------------------------------------------------------
 # 단계 1: 구조화 데이터 변환 (NLP -> Graph)
 # ---------------------------------------------------------------------------
-def stage1_nlp_to_graph(user_input: str) -> Dict[str, Any]:
-    """
-    자연어 시나리오에서 인물/회사/관계 등을 뽑아 그래프 구조(JSON)로 변환합니다.
-    """
-    system_prompt = """
+# 시스템 프롬프트는 매 호출마다 바이트 단위로 동일해야 OpenAI 프롬프트 프리픽스 캐시가 적용됩니다.
+# (타임스탬프·UUID 등 가변 값을 넣지 말 것)
+STAGE1_SYSTEM_PROMPT = """
     당신은 회계감사 관계 추출 전문가입니다. 입력된 시나리오에서 노드와 관계를 추출하여 JSON으로 반환하세요.
     - Nodes: id(p1, o1 등), label(Person, Organization, Asset), properties(name, firm_role, is_client, value 등)
     - Relationships: source_id, target_id, type(EMPLOYED_BY, OWNS, ISSUED_BY, FAMILY_OF 등)
     """
-    response = client.chat.completions.create(
-        model=OPENAI_MODEL_GRAPH,
-        messages=[
-            {"role": "system", "content": system_prompt},
+
+
+def build_stage1_request(user_input: str) -> Dict[str, Any]:
+    """단계 1 Chat Completions 요청 본문 (실시간 호출과 Batch API 가 공유)."""
+    return {
+        "model": OPENAI_MODEL_GRAPH,
+        "messages": [
+            {"role": "system", "content": STAGE1_SYSTEM_PROMPT},
             {"role": "user", "content": user_input},
         ],
-        response_format={"type": "json_object"},
-        temperature=0,
-    )
-    return safe_json_parse(response.choices[0].message.content or "")
+        "response_format": {"type": "json_object"},
+        "temperature": 0,
+        # 그래프 JSON 크기 상한 (응답 지연·비용의 최악값 제한)
+        "max_tokens": 800,
+    }
 
 
-# ---------------------------------------------------------------------------
-# 단계 2: 법령 컨텍스트 주입 (Context Injection)
-# ---------------------------------------------------------------------------
-def stage2_inject_law_context(graph_data: Dict[str, Any]) -> str:
+async def stage1_nlp_to_graph(user_input: str) -> Dict[str, Any]:
     """
-    그래프 내용(키워드)을 보고, 관련 법령 설명 문구를 자동으로 붙입니다.
-    - 키워드 목록 (예: "주식", "대출")
-    - 해당 키워드가 있을 때 붙일 설명 문구
+    자연어 시나리오에서 인물/회사/관계 등을 뽑아 그래프 구조(JSON)로 변환합니다.
     """
-    context: List[str] = []
-    data_str = str(graph_data)
+    content = await cached_chat_completion(**build_stage1_request(user_input))
+    return safe_json_parse(content)
 
-    # 예시 1: 지분/주식 보유 관련
-    if any(k in data_str for k in ["주식", "회원권", "지분", "OWNS"]):
-        context.append(
-            "[공인회계사법 제21조] 감사인 또는 그 배우자가 피감사회사의 주식, 사채, 회원권 등을 보유한 경우 감사업무 금지."
-        )
 
+# ---------------------------------------------------------------------------
+# 단계 2: 법령 컨텍스트 주입 (Context Injection)
+# ---------------------------------------------------------------------------
+# (키워드 목록, 해당 키워드가 있을 때 붙일 설명 문구) — 출력 순서는 목록 순서를 따릅니다.
+LAW_CONTEXT_RULES: List[Tuple[Tuple[str, ...], str]] = [
+    # 예시 1: 지분/주식 보유 관련
+    (
+        ("주식", "회원권", "지분", "OWNS"),
+        "[공인회계사법 제21조] 감사인 또는 그 배우자가 피감사회사의 주식, 사채, 회원권 등을 보유한 경우 감사업무 금지.",
+    ),
     # 예시 2: 비감사서비스/자문 관련
-    if any(k in data_str for k in ["계리", "자문", "Consulting"]):
-        context.append(
-            "[외부감사법 제9조] 비감사서비스(보험계리, 내부통제 구축 등) 제공 시 독립성 훼손으로 간주."
-        )
-
+    (
+        ("계리", "자문", "Consulting"),
+        "[외부감사법 제9조] 비감사서비스(보험계리, 내부통제 구축 등) 제공 시 독립성 훼손으로 간주.",
+    ),
     # 예시 3: 차입/대출 관련
-    if any(k in data_str for k in ["카드", "할부", "대출", "차입"]):
-        context.append(
-            "[공인회계사법 시행령 제14조] 5천만원 이상의 채권/채무는 금지되나, 금융기관의 통상적 약관에 따른 거래는 예외."
-        )
-
+    (
+        ("카드", "할부", "대출", "차입"),
+        "[공인회계사법 시행령 제14조] 5천만원 이상의 채권/채무는 금지되나, 금융기관의 통상적 약관에 따른 거래는 예외.",
+    ),
     # 예시 4: 가족관계 관련
-    if any(k in data_str for k in ["배우자", "FAMILY_OF"]):
-        context.append(
-            "[윤리기준] 감사팀 소속원의 직계 가족이 피감사인의 임원인 경우 수임 제한."
-        )
+    (
+        ("배우자", "FAMILY_OF"),
+        "[윤리기준] 감사팀 소속원의 직계 가족이 피감사인의 임원인 경우 수임 제한.",
+    ),
+]
+
+
+def _build_law_keyword_automaton() -> ahocorasick.Automaton:
+    """모든 키워드를 한 번에 찾는 Aho–Corasick 오토마톤을 만듭니다 (값 = 규칙 인덱스)."""
+    automaton = ahocorasick.Automaton()
+    for idx, (keywords, _) in enumerate(LAW_CONTEXT_RULES):
+        for keyword in keywords:
+            automaton.add_word(keyword, idx)
+    automaton.make_automaton()
+    return automaton
+
 
+_LAW_KEYWORD_AUTOMATON = _build_law_keyword_automaton()
+
+
+def _iter_graph_text(value: Any) -> Iterator[str]:
+    """
+    그래프(JSON) 안의 모든 문자열 키/값을 순회합니다. (str(dict) 전체 문자열화 대신 사용)
+    - 모델이 만든 속성 키(예: "지분율", "주식수")도 키워드 검사 대상에 포함합니다.
+    """
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for k, v in value.items():
+            if isinstance(k, str):
+                yield k
+            yield from _iter_graph_text(v)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            yield from _iter_graph_text(v)
+
+
+def stage2_inject_law_context(graph_data: Dict[str, Any]) -> str:
+    """
+    그래프 내용(키워드)을 보고, 관련 법령 설명 문구를 자동으로 붙입니다.
+    - 키워드 → 문구 매핑은 LAW_CONTEXT_RULES 참고
+    - 그래프 텍스트를 한 번만 훑어 모든 키워드를 동시에 찾습니다.
+    """
+    # 서로 다른 값이 이어 붙어 키워드가 생기지 않도록 줄바꿈으로 구분
+    text = "\n".join(_iter_graph_text(graph_data))
+    matched = {idx for _, idx in _LAW_KEYWORD_AUTOMATON.iter(text)}
+    context = [
+        law_text
+        for idx, (_, law_text) in enumerate(LAW_CONTEXT_RULES)
+        if idx in matched
+    ]
     return "\n".join(context) if context else "일반적 독립성 준수 원칙 적용"
 
 
 # ---------------------------------------------------------------------------
 # 단계 3: 전문가 분석 엔진 (Expert Analysis)
 # ---------------------------------------------------------------------------
-def stage3_expert_analysis(
+# 고정 지시문 전체를 시스템 메시지로 두고, 요청마다 달라지는 입력만 사용자 메시지로 보냅니다.
+STAGE3_SYSTEM_PROMPT = """
+    Senior Audit Quality Control Partner
+
+    당신은 대형 회계법인 품질관리실 파트너입니다. 한국 공인회계사 윤리기준과 외부감사법, 공인회계사법을 기준으로
+    독립성 위협을 평가하여, 아래 세 가지 상태 중 하나로 신중하게 분류해야 합니다.
+
+    - "수임 불가": 법령상 절대적 금지 또는 실질적으로 수임이 허용되지 않는 중대한 위반이 있는 경우에만 사용
+    - "안전장치 적용 시 수임 가능": 위협이 있으나, 적절한 안전장치(격리, 처분, 팀교체 등)를 통해 수용 가능한 수준으로 낮출 수 있는 경우
+    - "수임 가능": 독립성 위협이 중요하지 않은 수준이거나, 식별된 위협이 없고 법령·윤리기준에 위배되지 않는 경우
+
+    입력은 사용자 메시지의 [시나리오], [데이터](그래프 JSON), [법령 컨텍스트] 로 주어집니다.
+
+    [작성 가이드라인]
+    1. Opinion (구조화): 줄글을 지양하고 아래 섹션별로 HTML 태그(<b>, <li>, <br>)를 사용하여 요약하세요.
+       - <b style='color:#64b5f6'>[핵심 위반 사항]</b>: 식별된 리스크 요약 (불렛포인트 사용)
+       - <b style='color:#64b5f6'>[법적/규정 판단]</b>: 관련 법령 조항과 위반 사실의 1:1 매칭
+       - <b style='color:#64b5f6'>[실무적 시사점]</b>: 독립채산제 등 법인의 특수성을 고려한 최종 경고
+
+    2. Safeguards (구체성):
+       - '수임 불가'인 경우: 정말로 법령상 절대적 금지 사유인지를 한번 더 점검한 뒤,
+         "법령상 절대적 금지 사유로 인해 어떠한 안전장치로도 해결 불가능함"을 명시하고 그 이유를 구체적으로 쓰세요.
+       - '안전장치 적용 시 수임 가능'인 경우: 즉시 실행 가능한 구체적 조치(격리, 처분, 팀 교체, 자문부서 분리 등)를 나열하세요.
+       - '수임 가능'인 경우: 불필요한 공포를 주지 않도록, 왜 위협이 경미하다고 판단했는지 간단히 설명하고
+         필요한 경우에만 경미한 수준의 주의사항을 제시하세요.
+
+    [JSON 포맷]  ※ status 값은 다음 세 단어 중 하나만 사용하세요.
+    - "수임 불가"
+    - "안전장치 적용 시 수임 가능"
+    - "수임 가능"
+
+    {
+        "status": "수임 불가" 또는 "안전장치 적용 시 수임 가능" 또는 "수임 가능",
+        "reason": "구조화된 HTML 전문가 의견서",
+        "safeguards": ["조치 또는 불가 사유 1", "2"],
+        "relevant_laws": ["공인회계사법 제21조" 등],
+        "risky_node_ids": ["위험 노드 ID"],
+        "risky_edge_indices": ["위험 관계 인덱스"]
+    }
+    """
+
+
+def _graph_signature(graph_data: Dict[str, Any]) -> Tuple[Any, ...]:
+    """
+    의미 유사 캐시용 그래프 구조 시그니처 (노드 ID, 관계 순서/종류).
+    - risky_node_ids / risky_edge_indices 가 가리키는 대상이 같은 그래프끼리만 응답을 재사용합니다.
+    """
+    node_ids = tuple(str(n.get("id")) for n in graph_data.get("nodes") or ())
+    edges = tuple(
+        (str(r.get("source_id")), str(r.get("type")), str(r.get("target_id")))
+        for r in graph_data.get("relationships") or ()
+    )
+    return node_ids, edges
+
+
+def build_stage3_request(
+    scenario: str, graph_data: Dict[str, Any], law_context: str
+) -> Dict[str, Any]:
+    """단계 3 Chat Completions 요청 본문 (실시간 호출과 Batch API 가 공유)."""
+    user_prompt = (
+        f"[시나리오] {scenario}\n"
+        f"[데이터] {orjson.dumps(graph_data).decode()}\n"
+        f"[법령 컨텍스트] {law_context}"
+    )
+    return {
+        "model": OPENAI_MODEL_ANALYSIS,
+        "messages": [
+            {"role": "system", "content": STAGE3_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ],
+        "response_format": {"type": "json_object"},
+        "temperature": 0.1,
+        # 의견서 JSON 은 필드가 고정되어 있으므로 출력 길이를 제한하고,
+        # 혹시 코드 펜스로 감싸 답하더라도 닫는 펜스에서 멈추게 합니다.
+        "max_tokens": 1200,
+        "stop": ["\n```"],
+    }
+
+
+async def stage3_expert_analysis(
     scenario: str, graph_data: Dict[str, Any], law_context: str
 ) -> Dict[str, Any]:
     """
@@ -152,106 +384,222 @@ def stage3_expert_analysis(
         "risky_edge_indices": [0, 2]
     }
     """
-    prompt = f"""
-    당신은 대형 회계법인 품질관리실 파트너입니다. 한국 공인회계사 윤리기준과 외부감사법, 공인회계사법을 기준으로
-    독립성 위협을 평가하여, 아래 세 가지 상태 중 하나로 신중하게 분류해야 합니다.
-
-    - "수임 불가": 법령상 절대적 금지 또는 실질적으로 수임이 허용되지 않는 중대한 위반이 있는 경우에만 사용
-    - "안전장치 적용 시 수임 가능": 위협이 있으나, 적절한 안전장치(격리, 처분, 팀교체 등)를 통해 수용 가능한 수준으로 낮출 수 있는 경우
-    - "수임 가능": 독립성 위협이 중요하지 않은 수준이거나, 식별된 위협이 없고 법령·윤리기준에 위배되지 않는 경우
-
-    [시나리오] {scenario}
-    [데이터] {json.dumps(graph_data, ensure_ascii=False)}
-    [법령 컨텍스트] {law_context}
+    request = build_stage3_request(scenario, graph_data, law_context)
+
+    # 정확 일치 캐시에 없을 때만 임베딩을 만들어 유사 시나리오를 찾습니다.
+    # 위험 노드/엣지 표시는 그래프 구조가 같을 때만 의미가 있으므로 구조 시그니처도 일치해야 합니다.
+    scenario_vec: List[float] = []
+    signature = _graph_signature(graph_data)
+    if (
+        semantic_cache is not None
+        and response_cache.get(ResponseCache.make_key(request)) is None
+    ):
+        try:
+            scenario_vec = await embed_text(scenario)
+        except Exception:
+            # 의미 유사 캐시는 선택 기능이므로, 임베딩 실패 시 건너뛰고 정상 호출로 진행
+            logger.warning(
+                "시나리오 임베딩 실패 — 의미 유사 캐시를 건너뜁니다.", exc_info=True
+            )
+        if scenario_vec:
+            cached = await asyncio.to_thread(
+                semantic_cache.lookup, scenario_vec, signature
+            )
+            if cached is not None:
+                return safe_json_parse(cached)
+
+    content = await cached_chat_completion(**request)
+    if semantic_cache is not None and scenario_vec and is_valid_json_reply(content):
+        semantic_cache.add(scenario_vec, content, signature)
+    return safe_json_parse(content)
+
+
+# 모델이 돌려줄 수 있는 정규 status 값
+VALID_STATUSES = frozenset({"수임 불가", "안전장치 적용 시 수임 가능", "수임 가능"})
+
+# (포함 여부를 볼 문구, 정규화된 status) — 앞에서부터 처음 일치하는 항목을 사용
+_STATUS_MAP = (
+    ("수임 불가", "수임 불가"),
+    ("안전장치", "안전장치 적용 시 수임 가능"),
+    ("수임 가능", "수임 가능"),
+)
+
+
+def normalize_status(raw: Any) -> str:
+    """
+    status 값이 프롬프트 설명 문구 등으로 잘못 나오는 경우를 세 가지 상태 중 하나로 정규화합니다.
+    - 어느 것에도 해당하지 않으면 "검토 중"을 반환합니다.
+    """
+    status = str(raw or "").strip()
+    if status in VALID_STATUSES:
+        return status
+    for needle, canonical in _STATUS_MAP:
+        if needle in status:
+            return canonical
+    return "검토 중"
 
-    [작성 가이드라인]
-    1. Opinion (구조화): 줄글을 지양하고 아래 섹션별로 HTML 태그(<b>, <li>, <br>)를 사용하여 요약하세요.
-       - <b style='color:#64b5f6'>[핵심 위반 사항]</b>: 식별된 리스크 요약 (불렛포인트 사용)
-       - <b style='color:#64b5f6'>[법적/규정 판단]</b>: 관련 법령 조항과 위반 사실의 1:1 매칭
-       - <b style='color:#64b5f6'>[실무적 시사점]</b>: 독립채산제 등 법인의 특수성을 고려한 최종 경고
 
-    2. Safeguards (구체성):
-       - '수임 불가'인 경우: 정말로 법령상 절대적 금지 사유인지를 한번 더 점검한 뒤,
-         "법령상 절대적 금지 사유로 인해 어떠한 안전장치로도 해결 불가능함"을 명시하고 그 이유를 구체적으로 쓰세요.
-       - '안전장치 적용 시 수임 가능'인 경우: 즉시 실행 가능한 구체적 조치(격리, 처분, 팀 교체, 자문부서 분리 등)를 나열하세요.
-       - '수임 가능'인 경우: 불필요한 공포를 주지 않도록, 왜 위협이 경미하다고 판단했는지 간단히 설명하고
-         필요한 경우에만 경미한 수준의 주의사항을 제시하세요.
+def normalize_risky_node_ids(values: Any) -> List[str]:
+    """
+    모델이 돌려준 위험 노드 ID 목록을 문자열 목록으로 정리합니다.
+    - dict/list 등 비교할 수 없는 항목은 버립니다.
+    """
+    if not isinstance(values, (list, tuple)):
+        return []
+    return [
+        str(v)
+        for v in values
+        if isinstance(v, (str, int)) and not isinstance(v, bool)
+    ]
 
-    [JSON 포맷]  ※ status 값은 다음 세 단어 중 하나만 사용하세요.
-    - "수임 불가"
-    - "안전장치 적용 시 수임 가능"
-    - "수임 가능"
 
-    {{
-        "status": "수임 불가" 또는 "안전장치 적용 시 수임 가능" 또는 "수임 가능",
-        "reason": "구조화된 HTML 전문가 의견서",
-        "safeguards": ["조치 또는 불가 사유 1", "2"],
-        "relevant_laws": ["공인회계사법 제21조" 등],
-        "risky_node_ids": ["위험 노드 ID"],
-        "risky_edge_indices": ["위험 관계 인덱스"]
-    }}
+def normalize_risky_edge_indices(values: Any) -> List[int]:
     """
-    response = client.chat.completions.create(
-        model=OPENAI_MODEL_ANALYSIS,
-        messages=[
-            {"role": "system", "content": "Senior Audit Quality Control Partner"},
-            {"role": "user", "content": prompt},
-        ],
-        response_format={"type": "json_object"},
-        temperature=0.1,
-    )
-    return safe_json_parse(response.choices[0].message.content or "")
+    모델이 돌려준 위험 관계 인덱스 목록을 정수 목록으로 정리합니다.
+    - 프롬프트 예시대로 "0" 같은 문자열 인덱스도 정수로 바꿉니다 (10진 숫자만 허용).
+    """
+    if not isinstance(values, (list, tuple)):
+        return []
+    indices: List[int] = []
+    for v in values:
+        if isinstance(v, bool):
+            continue
+        if isinstance(v, int):
+            indices.append(v)
+        elif isinstance(v, str) and v.strip().isdecimal():
+            indices.append(int(v.strip()))
+    return indices
+
+
+def normalize_analysis(raw_analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    단계 3 결과의 status / risky_node_ids / risky_edge_indices 를 한 번에 정규화합니다.
+    - API 응답과 리스크 맵 렌더링이 같은 값을 쓰도록 이 결과를 공유합니다.
+    """
+    return {
+        **raw_analysis,
+        "status": normalize_status(raw_analysis.get("status")),
+        "risky_node_ids": normalize_risky_node_ids(raw_analysis.get("risky_node_ids")),
+        "risky_edge_indices": normalize_risky_edge_indices(
+            raw_analysis.get("risky_edge_indices")
+        ),
+    }
 
 
 # ---------------------------------------------------------------------------
 # 단계 4: 그래프 이미지 URL 생성 (Mermaid -> PNG URL)
 # ---------------------------------------------------------------------------
-def build_graph_image_url(graph: Dict[str, Any], analysis: Dict[str, Any]) -> str:
+_MERMAID_FOOTER = "\n".join(
+    [
+        "    classDef normalNode fill:#ffffff,stroke:#333,stroke-width:1px;",
+        "    classDef riskyNode fill:#fff5f5,stroke:#ff0000,stroke-width:2px,stroke-dasharray: 5 5;",
+    ]
+)
+
+# properties 가 없는 노드용 읽기 전용 기본값 (노드마다 빈 dict 를 만들지 않기 위함)
+_EMPTY: Mapping[str, Any] = MappingProxyType({})
+
+# (그래프, 위험 노드/엣지) 해시 → 이미지 URL
+_graph_url_cache: LRUCache[bytes, str] = LRUCache(maxsize=128)
+
+
+class MermaidSkeleton(NamedTuple):
+    """위험 표시(⚠️, 강조 스타일)를 적용하기 전의 Mermaid 그래프 골격."""
+
+    # (노드 ID, 표시 텍스트)
+    nodes: Tuple[Tuple[Any, str], ...]
+    # (출발 노드 ID, 관계 라벨, 도착 노드 ID) — 인덱스는 relationships 순서와 같음
+    edges: Tuple[Tuple[Any, str, Any], ...]
+
+
+def render_mermaid_skeleton(graph: Dict[str, Any]) -> MermaidSkeleton:
     """
-    그래프와 위험 노드/엣지 정보를 이용해 Mermaid 다이어그램을 만들고,
-    이를 mermaid.ink의 PNG 이미지 URL로 변환합니다.
+    그래프만으로 만들 수 있는 노드 표시 텍스트/관계 라벨을 미리 계산합니다.
+    - 단계 3 결과(위험 노드/엣지)가 필요 없으므로 단계 3과 병렬로 실행할 수 있습니다.
     """
-    mm_code: List[str] = ["graph TD"]
-    risky_nodes = analysis.get("risky_node_ids", [])
-
-    for node in graph.get("nodes", []):
+    nodes: List[Tuple[Any, str]] = []
+    add_node = nodes.append
+    for node in graph.get("nodes") or ():
         nid = node.get("id")
-        props = node.get("properties", {})
+        props = node.get("properties") or _EMPTY
         name = props.get("name") or props.get("type") or nid
-        role = props.get("firm_role", "") or props.get("position", "")
-        if role:
-            display_text = f"<b>{name}</b><br/>[{role}]"
-        else:
-            display_text = name
-        mm_code.append(
-            f'    {nid}["{"⚠️ " if nid in risky_nodes else ""}{display_text}"]:::{ "riskyNode" if nid in risky_nodes else "normalNode" }'
-        )
-
-    for idx, edge in enumerate(graph.get("relationships", [])):
-        s = edge.get("source_id")
-        e = edge.get("target_id")
-        t = edge.get("type")
+        role = props.get("firm_role") or props.get("position")
+        add_node((nid, f"<b>{name}</b><br/>[{role}]" if role else name))
+
+    edges: List[Tuple[Any, str, Any]] = []
+    add_edge = edges.append
+    for edge in graph.get("relationships") or ():
         # 관계 타입 문자열에서 언더스코어를 공백으로 바꾸고,
         # 너무 길 경우 첫 번째 공백에서 줄바꿈을 한 번 넣어 텍스트 겹침을 줄인다.
-        label = t.replace("_", " ")
-        if len(label) > 12 and " " in label:
+        label = edge.get("type").replace("_", " ")
+        if len(label) > 12:
             first_space = label.find(" ")
-            label = label[:first_space] + "\\n" + label[first_space + 1 :]
-        if idx in analysis.get("risky_edge_indices", []):
-            mm_code.append(f'    {s} -. "⚠️ {label}" .-> {e}')
-        else:
-            mm_code.append(f'    {s} ---|"{label}"| {e}')
-
-    mm_code.append(
-        "    classDef normalNode fill:#ffffff,stroke:#333,stroke-width:1px;"
+            if first_space != -1:
+                label = label[:first_space] + "\\n" + label[first_space + 1 :]
+        add_edge((edge.get("source_id"), label, edge.get("target_id")))
+
+    return MermaidSkeleton(tuple(nodes), tuple(edges))
+
+
+def _apply_risky_marks(
+    skeleton: MermaidSkeleton,
+    risky_node_ids: Iterable[str],
+    risky_edge_indices: Iterable[int],
+) -> List[str]:
+    """
+    골격에 위험 노드/엣지 표시를 입혀 Mermaid 코드 줄 목록을 만듭니다.
+    - risky_*: normalize_risky_node_ids / normalize_risky_edge_indices 로 정리한 값
+    """
+    # 멤버십 검사를 O(1)로 하기 위해 한 번만 집합으로 변환
+    risky_nodes = frozenset(risky_node_ids)
+    risky_edges = frozenset(risky_edge_indices)
+
+    mm_code: List[str] = ["graph TD"]
+    mm_code.extend(
+        f'    {nid}["⚠️ {text}"]:::riskyNode'
+        if str(nid) in risky_nodes
+        else f'    {nid}["{text}"]:::normalNode'
+        for nid, text in skeleton.nodes
     )
-    mm_code.append(
-        "    classDef riskyNode fill:#fff5f5,stroke:#ff0000,stroke-width:2px,stroke-dasharray: 5 5;"
+    mm_code.extend(
+        f'    {s} -. "⚠️ {label}" .-> {e}'
+        if idx in risky_edges
+        else f'    {s} ---|"{label}"| {e}'
+        for idx, (s, label, e) in enumerate(skeleton.edges)
     )
+    mm_code.append(_MERMAID_FOOTER)
+    return mm_code
+
+
+def build_graph_image_url(
+    graph: Dict[str, Any],
+    analysis: Dict[str, Any],
+    skeleton: Optional[MermaidSkeleton] = None,
+) -> str:
+    """
+    그래프와 위험 노드/엣지 정보를 이용해 Mermaid 다이어그램을 만들고,
+    이를 mermaid.ink의 PNG 이미지 URL로 변환합니다.
+    - 같은 그래프/위험 표시 조합이면 캐시된 URL을 그대로 돌려줍니다.
+    - skeleton: 미리 계산해 둔 render_mermaid_skeleton(graph) 결과 (없으면 여기서 계산)
+    """
+    # normalize_analysis 를 거친 값이면 그대로 유지됩니다 (멱등).
+    risky_node_ids = normalize_risky_node_ids(analysis.get("risky_node_ids"))
+    risky_edge_indices = normalize_risky_edge_indices(analysis.get("risky_edge_indices"))
+
+    cache_key = hashlib.blake2b(
+        orjson.dumps((graph, risky_node_ids, risky_edge_indices))
+    ).digest()
+    cached = _graph_url_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    if skeleton is None:
+        skeleton = render_mermaid_skeleton(graph)
+    mm_code = _apply_risky_marks(skeleton, risky_node_ids, risky_edge_indices)
 
     graph_url = (
         "https://mermaid.ink/img/"
         + base64.b64encode("\n".join(mm_code).encode("utf-8")).decode("ascii")
     )
+    _graph_url_cache.set(cache_key, graph_url)
     return graph_url
-
@@ -0,0 +1,209 @@
+"""OpenAI Batch API 기반 대량 분석 (비대화형/대용량 모드).
+
+- 단계 1: 모든 시나리오의 그래프 추출 요청을 JSONL 로 묶어 하나의 배치로 제출
+- 단계 2: 배치 결과 그래프로 법령 컨텍스트를 로컬에서 계산
+- 단계 3: 전문가 분석 요청을 두 번째 배치로 제출한 뒤 결과를 합쳐 반환
+
+배치는 최대 24시간 안에 처리되며 실시간 호출보다 비용이 낮습니다.
+실시간 `/analyze` 와는 별도로 CLI 로 실행합니다.
+
+    python -m backend.services.engine_batch scenarios.jsonl -o results.jsonl
+
+입력 파일은 한 줄에 하나씩 {"scenario": "..."} 형태의 JSON 을 담습니다.
+"""
+
+import argparse
+import asyncio
+import sys
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import orjson
+
+from backend.services.engine import (
+    build_graph_image_url,
+    build_stage1_request,
+    build_stage3_request,
+    client,
+    is_valid_json_reply,
+    normalize_analysis,
+    safe_json_parse,
+    stage2_inject_law_context,
+)
+
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+# 배치가 더 이상 진행되지 않는 상태
+_BATCH_FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class BatchReply(NamedTuple):
+    """배치 요청 하나의 결과 (성공 시 content, 실패 시 error)."""
+
+    content: str = ""
+    error: Optional[str] = None
+
+
+def _parse_batch_line(item: Dict[str, Any]) -> BatchReply:
+    """배치 출력/오류 파일의 한 줄을 BatchReply 로 변환합니다."""
+    if item.get("error"):
+        err = item["error"]
+        return BatchReply(error=str(err.get("message") or err.get("code") or err))
+
+    response = item.get("response") or {}
+    body = response.get("body") or {}
+    if response.get("status_code") != 200:
+        err = body.get("error") or {}
+        message = err.get("message") or f"HTTP {response.get('status_code')}"
+        return BatchReply(error=str(message))
+
+    choices = body.get("choices") or []
+    if not choices:
+        return BatchReply(error="모델 응답이 비어 있습니다.")
+    if choices[0].get("finish_reason") == "length":
+        # 실시간 경로의 TruncatedResponseError 와 같은 기준
+        return BatchReply(error="모델 응답이 max_tokens 한도에서 잘렸습니다.")
+    return BatchReply(content=(choices[0].get("message") or {}).get("content") or "")
+
+
+async def _read_batch_file(file_id: Optional[str]) -> Dict[str, BatchReply]:
+    if not file_id:
+        return {}
+    content = await client.files.content(file_id)
+    replies: Dict[str, BatchReply] = {}
+    for line in content.text.splitlines():
+        if line.strip():
+            item = orjson.loads(line)
+            replies[item["custom_id"]] = _parse_batch_line(item)
+    return replies
+
+
+async def run_chat_batch(
+    batch_requests: List[Tuple[str, Dict[str, Any]]], poll_interval: float = 30.0
+) -> Dict[str, BatchReply]:
+    """
+    (custom_id, 요청 본문) 목록을 하나의 배치로 제출하고, 완료되면 custom_id → BatchReply 를 돌려줍니다.
+    - 개별 요청 오류(오류 파일 포함), 잘린 응답(finish_reason="length"),
+      결과에 없는 요청은 모두 error 가 채워진 BatchReply 로 돌려줍니다.
+    """
+    lines = [
+        orjson.dumps(
+            {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+        )
+        for custom_id, body in batch_requests
+    ]
+    input_file = await client.files.create(
+        file=("batch_input.jsonl", b"\n".join(lines)), purpose="batch"
+    )
+    batch = await client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window="24h",
+    )
+    while batch.status not in _BATCH_FINAL_STATUSES:
+        await asyncio.sleep(poll_interval)
+        batch = await client.batches.retrieve(batch.id)
+
+    if batch.status != "completed":
+        raise RuntimeError(f"배치 {batch.id} 처리 실패 (status={batch.status})")
+
+    replies = await _read_batch_file(batch.output_file_id)
+    replies.update(await _read_batch_file(batch.error_file_id))
+    missing = BatchReply(error="배치 결과에 해당 요청이 없습니다.")
+    return {custom_id: replies.get(custom_id, missing) for custom_id, _ in batch_requests}
+
+
+async def batch_analyze(
+    scenarios: List[str], poll_interval: float = 30.0
+) -> List[Dict[str, Any]]:
+    """
+    여러 시나리오를 Batch API 로 분석합니다.
+    - 반환 항목은 `/batch` 응답(BatchItemResponse)과 같은 형태입니다:
+      {"scenario", "result"(AnalyzeResponse 와 같은 키), "error"}
+    - 단계 1이 실패했거나 해석할 수 없는 시나리오는 단계 3을 제출하지 않고 error 로 남깁니다.
+      (추출된 사실 없이 판정이 나오는 일을 막기 위함)
+    """
+    if not scenarios:
+        return []
+
+    errors: Dict[int, str] = {}
+    graphs: Dict[int, Dict[str, Any]] = {}
+    law_contexts: Dict[int, str] = {}
+
+    stage1 = await run_chat_batch(
+        [(f"stage1-{i}", build_stage1_request(s)) for i, s in enumerate(scenarios)],
+        poll_interval,
+    )
+    for i in range(len(scenarios)):
+        reply = stage1[f"stage1-{i}"]
+        if reply.error:
+            errors[i] = f"단계 1 실패: {reply.error}"
+        elif not is_valid_json_reply(reply.content):
+            errors[i] = "단계 1 실패: 그래프 응답을 JSON 으로 해석할 수 없습니다."
+        else:
+            graphs[i] = safe_json_parse(reply.content)
+            law_contexts[i] = stage2_inject_law_context(graphs[i])
+
+    stage3: Dict[str, BatchReply] = {}
+    if graphs:
+        stage3 = await run_chat_batch(
+            [
+                (f"stage3-{i}", build_stage3_request(scenarios[i], g, law_contexts[i]))
+                for i, g in graphs.items()
+            ],
+            poll_interval,
+        )
+
+    results: List[Dict[str, Any]] = []
+    for i, scenario in enumerate(scenarios):
+        result: Optional[Dict[str, Any]] = None
+        if i not in errors:
+            reply = stage3[f"stage3-{i}"]
+            if reply.error:
+                errors[i] = f"단계 3 실패: {reply.error}"
+            elif not is_valid_json_reply(reply.content):
+                errors[i] = "단계 3 실패: 의견서 응답을 JSON 으로 해석할 수 없습니다."
+            else:
+                graph_data = graphs[i]
+                analysis_result = normalize_analysis(safe_json_parse(reply.content))
+                result = {
+                    "status": analysis_result["status"],
+                    "reason_html": analysis_result.get("reason", ""),
+                    "safeguards": analysis_result.get("safeguards", []),
+                    "relevant_laws": analysis_result.get("relevant_laws", []),
+                    "graph": graph_data,
+                    "law_context": law_contexts[i],
+                    "risky_node_ids": analysis_result["risky_node_ids"],
+                    "risky_edge_indices": analysis_result["risky_edge_indices"],
+                    "graph_image_url": build_graph_image_url(
+                        graph_data, analysis_result
+                    ),
+                }
+        results.append({"scenario": scenario, "result": result, "error": errors.get(i)})
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OpenAI Batch API 기반 감사 독립성 대량 분석")
+    parser.add_argument("input", help='한 줄에 {"scenario": "..."} 하나씩 담긴 JSONL 파일')
+    parser.add_argument("-o", "--output", help="결과 JSONL 파일 (기본: 표준 출력)")
+    parser.add_argument(
+        "--poll-interval", type=float, default=30.0, help="배치 상태 확인 간격(초)"
+    )
+    args = parser.parse_args()
+
+    with open(args.input, encoding="utf-8") as f:
+        scenarios = [orjson.loads(line)["scenario"] for line in f if line.strip()]
+
+    results = asyncio.run(batch_analyze(scenarios, args.poll_interval))
+    payload = b"".join(orjson.dumps(r) + b"\n" for r in results)
+
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(payload)
+    else:
+        sys.stdout.buffer.write(payload)
+
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,43 @@ DEFAULT_MODEL_ANALYSIS = "gpt-4.1-mini"
 OPENAI_MODEL_GRAPH = os.getenv("OPENAI_MODEL_GRAPH", DEFAULT_MODEL_GRAPH)
 OPENAI_MODEL_ANALYSIS = os.getenv("OPENAI_MODEL_ANALYSIS", DEFAULT_MODEL_ANALYSIS)
 
+# 의미 유사 캐시(단계 3)에서 시나리오 임베딩에 사용할 모델
+DEFAULT_MODEL_EMBEDDING = "text-embedding-3-small"
+
+OPENAI_MODEL_EMBEDDING = os.getenv("OPENAI_MODEL_EMBEDDING", DEFAULT_MODEL_EMBEDDING)
+
+# OpenAI 클라이언트 커넥션 풀 크기 (기본값은 openai SDK 기본값과 동일)
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "1000"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "100")
+)
+
+
+# === LLM 응답 캐시 ==========================================================
+
+# 정확 일치 캐시에 보관할 최대 응답 수
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+
+# 의미 유사 캐시 사용 여부 (기본 꺼짐: 캐시 미스마다 임베딩 호출이 한 번 추가됨)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# 이전 시나리오와의 코사인 유사도가 이 값 이상이면 전문가 의견을 재사용
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+
+
+# === 다건 분석 (/batch) =======================================================
+
+# /batch 에서 동시에 실행할 최대 시나리오 수 (OpenAI 속도 제한 고려)
+# - 모든 /batch 요청이 함께 나눠 쓰는 프로세스 전역 한도입니다.
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+# /batch 요청 하나에 담을 수 있는 최대 시나리오 수
+BATCH_MAX_SCENARIOS = int(os.getenv("BATCH_MAX_SCENARIOS", "50"))
+
 
 # === 백엔드 API 주소 (Streamlit → FastAPI) ==================================
 
@@ -7,22 +7,66 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from typing import List
+from typing import Any, Coroutine, List, TypeVar
+import asyncio
+import threading
 import time
 import concurrent.futures
 
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
 
 from common.config import BACKEND_URL
 from backend.services.engine import (
     get_dynamic_law_url,
+    normalize_analysis,
     stage1_nlp_to_graph,
     stage2_inject_law_context,
     stage3_expert_analysis,
     build_graph_image_url,
 )
 
+T = TypeVar("T")
+
+
+@st.cache_resource
+def _engine_loop() -> asyncio.AbstractEventLoop:
+    """
+    직접 실행 모드에서 비동기 엔진 함수를 돌릴 전용 이벤트 루프.
+    - 모듈 전역 AsyncOpenAI 클라이언트가 항상 같은 루프에서 사용되도록 재실행 간에 공유합니다.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+
+def run_engine(coro: Coroutine[Any, Any, T]) -> T:
+    """비동기 엔진 함수를 전용 이벤트 루프에서 실행하고 결과를 기다립니다."""
+    return asyncio.run_coroutine_threadsafe(coro, _engine_loop()).result()
+
+
+@st.cache_resource
+def _session() -> requests.Session:
+    """백엔드 호출용 HTTP 세션 (재실행 간 TCP keep-alive 연결 재사용)."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def backend_up() -> bool:
+    """
+    백엔드 헬스 체크 결과를 30초간 캐시합니다.
+    - 백엔드가 꺼져 있을 때 버튼을 누를 때마다 타임아웃을 기다리지 않도록 합니다.
+    """
+    try:
+        return _session().get(f"{BACKEND_URL}/health", timeout=2).status_code == 200
+    except requests.exceptions.RequestException:
+        return False
+
 
 def render_law_badges(relevant_laws: List[str]) -> str:
     badges = []
@@ -106,21 +150,13 @@ def main() -> None:
         progress_bar = st.progress(0, text="엔진 분석 준비 중 (0/3 단계)")
 
         try:
-            # 백엔드 API가 사용 가능한지 확인
-            use_backend = False
-            try:
-                health_check = requests.get(f"{BACKEND_URL}/health", timeout=2)
-                if health_check.status_code == 200:
-                    use_backend = True
-            except (requests.exceptions.ConnectionError, 
-                    requests.exceptions.Timeout, 
-                    requests.exceptions.RequestException):
-                use_backend = False
+            # 백엔드 API가 사용 가능한지 확인 (결과는 잠시 캐시됨)
+            use_backend = backend_up()
 
             if use_backend:
                 # 백엔드 API 사용
                 def call_backend():
-                    return requests.post(
+                    return _session().post(
                         f"{BACKEND_URL}/analyze",
                         json={"scenario": scenario},
                         timeout=120,
@@ -128,23 +164,41 @@ def main() -> None:
 
                 with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
                     future = executor.submit(call_backend)
-                    step = 0
-                    while not future.done():
-                        step = min(step + 5, 95)
-                        if step < 35:
-                            label = "엔진 분석 중 (1/3) 시나리오 구조화..."
-                        elif step < 70:
-                            label = "엔진 분석 중 (2/3) 법령 컨텍스트 적용..."
-                        else:
-                            label = "엔진 분석 중 (3/3) 전문가 의견 생성..."
-                        progress_bar.progress(step, text=label)
-                        time.sleep(0.2)
+                    start = time.monotonic()
 
                     try:
+                        # 응답이 오면 즉시 빠져나오고, 기다리는 동안에만 0.2초 간격으로 진행률 갱신
+                        # (future.result(timeout=...) 의 TimeoutError 는 call_backend 자체의
+                        #  TimeoutError 와 구분되지 않으므로 wait() 로 완료 여부만 확인)
+                        while not future.done():
+                            concurrent.futures.wait([future], timeout=0.2)
+                            if future.done():
+                                break
+                            elapsed = time.monotonic() - start
+                            step = min(int(elapsed * 25), 95)
+                            if step < 35:
+                                label = "엔진 분석 중 (1/3) 시나리오 구조화..."
+                            elif step < 70:
+                                label = "엔진 분석 중 (2/3) 법령 컨텍스트 적용..."
+                            else:
+                                label = "엔진 분석 중 (3/3) 전문가 의견 생성..."
+                            progress_bar.progress(step, text=label)
+
                         resp = future.result()
-                        if resp.status_code != 200:
+                        if resp.status_code == 502:
+                            # 응답 잘림 등 백엔드가 원인을 담아 돌려준 오류는
+                            # 직접 실행 모드로 다시 호출해도 같으므로 그대로 표시
+                            try:
+                                detail = resp.json().get("detail")
+                            except ValueError:
+                                detail = None
+                            progress_bar.empty()
+                            st.error(detail or "백엔드 분석 중 오류가 발생했습니다.")
+                            return
+                        elif resp.status_code != 200:
                             # 백엔드 응답이 비정상이면 직접 실행 모드로 전환
                             use_backend = False
+                            backend_up.clear()
                         else:
                             data = resp.json()
                     except (requests.exceptions.ConnectionError, 
@@ -152,32 +206,24 @@ def main() -> None:
                             requests.exceptions.RequestException) as e:
                         # 백엔드 호출 실패 시 직접 엔진 함수 호출로 전환
                         use_backend = False
+                        backend_up.clear()
 
             if not use_backend:
                 # 백엔드 없이 직접 엔진 함수 호출 (Streamlit Cloud용)
                 progress_bar.progress(10, text="엔진 분석 중 (1/3) 시나리오 구조화...")
-                graph_data = stage1_nlp_to_graph(scenario)
+                graph_data = run_engine(stage1_nlp_to_graph(scenario))
 
                 progress_bar.progress(40, text="엔진 분석 중 (2/3) 법령 컨텍스트 적용...")
                 law_context = stage2_inject_law_context(graph_data)
 
                 progress_bar.progress(70, text="엔진 분석 중 (3/3) 전문가 의견 생성...")
-                raw_analysis = stage3_expert_analysis(scenario, graph_data, law_context)
-
-                # status 정규화
-                valid_statuses = ["수임 불가", "안전장치 적용 시 수임 가능", "수임 가능"]
-                status = str(raw_analysis.get("status", "")).strip()
-                if status not in valid_statuses:
-                    if "수임 불가" in status:
-                        status = "수임 불가"
-                    elif "안전장치" in status:
-                        status = "안전장치 적용 시 수임 가능"
-                    elif "수임 가능" in status:
-                        status = "수임 가능"
-                    else:
-                        status = "검토 중"
-
-                analysis_result = {**raw_analysis, "status": status}
+                raw_analysis = run_engine(
+                    stage3_expert_analysis(scenario, graph_data, law_context)
+                )
+
+                # status / 위험 노드·엣지 정규화
+                analysis_result = normalize_analysis(raw_analysis)
+                status = analysis_result["status"]
                 graph_url = build_graph_image_url(graph_data, analysis_result)
 
                 data = {
@@ -187,8 +233,8 @@ def main() -> None:
                     "relevant_laws": analysis_result.get("relevant_laws", []),
                     "graph": graph_data,
                     "law_context": law_context,
-                    "risky_node_ids": analysis_result.get("risky_node_ids", []),
-                    "risky_edge_indices": analysis_result.get("risky_edge_indices", []),
+                    "risky_node_ids": analysis_result["risky_node_ids"],
+                    "risky_edge_indices": analysis_result["risky_edge_indices"],
                     "graph_image_url": graph_url,
                 }
 
@@ -202,20 +248,6 @@ def main() -> None:
         # 성공적으로 응답을 받은 경우, 100%로 마무리하고 결과를 세션에 저장
         progress_bar.progress(100, text="엔진 분석 완료 (3/3 단계)")
 
-        # status 문자열이 설명 문구 등을 포함하는 경우를 방지하기 위한 추가 정규화
-        valid_statuses = ["수임 불가", "안전장치 적용 시 수임 가능", "수임 가능"]
-        raw_status = str(data.get("status", "")).strip()
-        if raw_status not in valid_statuses:
-            if "수임 불가" in raw_status:
-                norm_status = "수임 불가"
-            elif "안전장치" in raw_status:
-                norm_status = "안전장치 적용 시 수임 가능"
-            elif "수임 가능" in raw_status:
-                norm_status = "수임 가능"
-            else:
-                norm_status = "검토 중"
-            data["status"] = norm_status
-
         st.session_state["analysis_result"] = data
 
     # --- 여기부터는 최근 분석 결과가 있을 때 언제나 우측 패널에 표시 ---